@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import time
+import heapq
 import datetime
 import json
+import os
+import tempfile
+import hashlib
+from io import BytesIO
 from pathlib import Path
+import openpyxl
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -14,19 +20,44 @@ st.set_page_config(
 
 # --- Funções de Persistência de Estado ---
 
+# Chaves do st.session_state gravadas em disco (as keys dos widgets e o estado derivado ficam de fora)
+PERSISTED_KEYS = (
+    'start_time', 'elapsed_time', 'running', 'game_started', 'last_tick',
+    'excel_loaded', 'atletas_df', 'oficiais_df', 'sanction_timers', 'adversary_sanction_timer',
+)
+
 def save_state():
-    """Guarda o st.session_state num ficheiro JSON."""
+    """Guarda o estado do jogo num ficheiro JSON, só se mudou desde a última gravação."""
     state_file = Path("andibol_state.json")
     state_to_save = {}
-    # Filtra objetos não serializáveis, se houver
-    for k, v in st.session_state.items():
-        if isinstance(v, (int, float, str, bool, list, dict, type(None))):
+    for k in PERSISTED_KEYS:
+        if k not in st.session_state:
+            continue
+        v = st.session_state[k]
+        if isinstance(v, pd.DataFrame):
+             # Formato em colunas ({'columns': [...], 'data': [[...], ...]}): os nomes das colunas não se repetem por linha
+             state_to_save[k] = v.to_dict('split', index=False)
+        else:
              state_to_save[k] = v
-        elif isinstance(v, pd.DataFrame):
-             state_to_save[k] = v.to_dict('records') # Converte DataFrame para um formato serializável
 
-    with state_file.open("w", encoding="utf-8") as f:
-        json.dump(state_to_save, f)
+    # Evita reescrever o ficheiro quando nada mudou (ex.: reruns com o jogo em pausa)
+    payload = json.dumps(state_to_save)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    if digest == st.session_state.get('saved_state_digest'):
+        return
+
+    # Escreve num ficheiro temporário e troca-o de uma vez: uma interrupção a meio nunca deixa o JSON truncado.
+    # O nome do temporário é único, para duas sessões a gravar ao mesmo tempo não escreverem no mesmo ficheiro.
+    tmp = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=state_file.parent, suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            tmp.write(payload)
+        os.replace(tmp.name, state_file)
+    except BaseException:
+        # Não deixa temporários órfãos ao lado do estado
+        os.unlink(tmp.name)
+        raise
+    st.session_state.saved_state_digest = digest
 
 def load_state():
     """Carrega o estado a partir de um ficheiro JSON, se existir."""
@@ -36,9 +67,17 @@ def load_state():
             try:
                 loaded_state = json.load(f)
                 for k, v in loaded_state.items():
-                    # Reconverte DataFrames se necessário
-                    if k in ['atletas_df', 'oficiais_df'] and isinstance(v, list):
-                        st.session_state[k] = pd.DataFrame(v)
+                    # Ficheiros antigos também guardavam keys de widgets, que não podem ser atribuídas
+                    if k not in PERSISTED_KEYS:
+                        continue
+                    # Reconverte DataFrames se necessário (dict em colunas; lista de registos nos ficheiros antigos)
+                    if k in ['atletas_df', 'oficiais_df'] and isinstance(v, dict):
+                        st.session_state[k] = set_category_dtypes(pd.DataFrame(v['data'], columns=v['columns']))
+                    elif k in ['atletas_df', 'oficiais_df'] and isinstance(v, list):
+                        st.session_state[k] = set_category_dtypes(pd.DataFrame(v))
+                    elif k == 'sanction_timers' and k not in st.session_state:
+                        # O JSON guarda as chaves como texto; os números dos atletas voltam a ser inteiros
+                        st.session_state[k] = {int(n) if n.isdigit() else n: t for n, t in v.items()}
                     elif k not in st.session_state:
                          st.session_state[k] = v
             except json.JSONDecodeError:
@@ -48,8 +87,10 @@ def load_state():
 # --- Inicialização do Estado da Sessão ---
 def initialize_state():
     """Inicializa todas as variáveis necessárias no st.session_state."""
-    # Carrega o estado anterior antes de inicializar
-    load_state()
+    # Carrega o estado anterior antes de inicializar (uma única vez por sessão, não a cada rerun)
+    if not st.session_state.get('state_restored', False):
+        load_state()
+        st.session_state.state_restored = True
 
     # Variáveis do cronómetro
     if 'start_time' not in st.session_state:
@@ -60,6 +101,8 @@ def initialize_state():
         st.session_state.running = False
     if 'game_started' not in st.session_state:
         st.session_state.game_started = False
+    if 'last_tick' not in st.session_state:
+        st.session_state.last_tick = time.time() # Âncora para somar o tempo de jogo dos atletas
 
     # Variáveis da equipa e do jogo
     if 'excel_loaded' not in st.session_state:
@@ -72,20 +115,114 @@ def initialize_state():
     # Timers de sanções
     if 'sanction_timers' not in st.session_state:
         st.session_state.sanction_timers = {} # {numero_atleta: end_time}
+    if 'sanction_heap' not in st.session_state:
+        # Min-heap [end_time, numero_atleta] para expirar sanções sem percorrer todos os timers
+        st.session_state.sanction_heap = [[t, n] for n, t in st.session_state.sanction_timers.items()]
+        heapq.heapify(st.session_state.sanction_heap)
     if 'adversary_sanction_timer' not in st.session_state:
         st.session_state.adversary_sanction_timer = 0 # end_time
 
 # --- Funções Auxiliares ---
 
+# Colunas obrigatórias de cada folha do Plantel.xlsx
+REQUIRED_ATLETA_COLS = ('Numero', 'Nome', 'Posicao')
+REQUIRED_OFICIAL_COLS = ('Posicao', 'Nome')
+
+# Valores possíveis da coluna 'Estado' dos atletas
+ESTADOS_ATLETA = ('Banco', 'Em Campo', '2min', 'Desqualificado', 'Sanção Oficial')
+
+def read_plantel_excel(file):
+    """Lê as folhas 'Atletas' e 'Oficiais' abrindo o livro Excel uma única vez (modo só de leitura)."""
+    # keep_links=False: não carrega as ligações a livros externos, que a app não usa
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        folhas = {}
+        for sheet_name in ('Atletas', 'Oficiais'):
+            ws = wb[sheet_name]
+            # Ignora a dimensão gravada no ficheiro (há programas que a escrevem errada) e lê até à última linha real
+            ws.reset_dimensions()
+            rows = ws.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            # Ignora linhas totalmente vazias (o pd.read_excel também as descarta no fim da folha)
+            data = [row for row in rows if any(v is not None for v in row)]
+            # Sem dimensão, as linhas deixam de ter todas a mesma largura: acerta o cabeçalho e as linhas
+            # pela mais larga (células à direita do cabeçalho ficam em 'Unnamed: i', como no pd.read_excel)
+            width = max(len(header), *map(len, data)) if data else len(header)
+            header += [None] * (width - len(header))
+            header = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+            # Cabeçalhos repetidos ganham sufixo, como no pd.read_excel ('Nome', 'Nome.1', 'Nome.2', ...)
+            contagens = {}
+            for i, nome in enumerate(header):
+                n = contagens.get(nome, 0)
+                while n > 0:
+                    contagens[nome] = n + 1
+                    nome = f"{nome}.{n}"
+                    n = contagens.get(nome, 0)
+                header[i] = nome
+                contagens[nome] = n + 1
+            data = [row + (None,) * (width - len(row)) for row in data]
+            folhas[sheet_name] = pd.DataFrame(data, columns=header)
+    finally:
+        wb.close()
+    return folhas['Atletas'], folhas['Oficiais']
+
+@st.cache_data(show_spinner=False)
+def parse_plantel_excel(file_key, _file_bytes):
+    """Devolve os DataFrames do plantel, em cache pelo hash do conteúdo (os bytes não entram na chave)."""
+    return read_plantel_excel(BytesIO(_file_bytes))
+
+def set_category_dtypes(df):
+    """Guarda 'Posicao' e 'Estado' como categorias: os filtros comparam códigos inteiros em vez de strings."""
+    if 'Posicao' in df.columns:
+        df['Posicao'] = df['Posicao'].astype('category')
+    if 'Estado' in df.columns:
+        df['Estado'] = pd.Categorical(df['Estado'], categories=ESTADOS_ATLETA)
+    return df
+
+def start_sanction_timer(numero, duration=120):
+    """Inicia (ou reinicia) a contagem de uma sanção de 2 minutos para o atleta."""
+    end_time = time.time() + duration
+    st.session_state.sanction_timers[numero] = end_time
+    heapq.heappush(st.session_state.sanction_heap, [end_time, numero])
+
+def expire_sanctions():
+    """Retira as sanções já terminadas (sanction_timers fica só com as ativas); devolve True se alguma terminou."""
+    now = time.time()
+    expired = False
+    heap = st.session_state.sanction_heap
+    sanction_timers = st.session_state.sanction_timers
+    df = st.session_state.atletas_df
+    while heap and heap[0][0] <= now:
+        end_time, numero = heapq.heappop(heap)
+        # Entrada antiga: o atleta foi entretanto sancionado de novo
+        if sanction_timers.get(numero) != end_time:
+            continue
+        del sanction_timers[numero]
+        expired = True
+        # Reverte o estado de 'Sanção Oficial' se aplicável
+        idx = df[df['Numero'] == numero].index
+        if not idx.empty and df.at[idx[0], 'Estado'] == 'Sanção Oficial':
+             df.at[idx[0], 'Estado'] = 'Banco'
+    return expired
+
+def tick_play_time():
+    """Soma o tempo de jogo dos atletas em campo desde o último tick (só segundos inteiros)."""
+    # Reruns em rajada (<1s) não contam tempo; as frações ficam para o tick seguinte
+    segundos = int(time.time() - st.session_state.last_tick)
+    if segundos > 0:
+        st.session_state.last_tick += segundos
+        # Uma única operação vetorizada para todos os atletas em campo
+        em_campo = st.session_state.atletas_df['Em Campo'].astype(bool)
+        st.session_state.atletas_df.loc[em_campo, 'Tempo Jogo (s)'] += segundos
+
 def format_time(seconds):
     """Formata segundos para o formato MM:SS."""
     return str(datetime.timedelta(seconds=int(seconds))).zfill(8)[3:]
 
-def get_player_status_color(atleta):
-    """Devolve a cor e o ícone com base no estado do atleta."""
-    numero = atleta['Numero']
+def get_player_status_color(atleta, remaining_time):
+    """Devolve a cor e o ícone com base no estado do atleta e no tempo de sanção em falta."""
     # Verifica se o jogador está com sanção ativa
-    if numero in st.session_state.sanction_timers and time.time() < st.session_state.sanction_timers[numero]:
+    if remaining_time > 0:
         return '🟧', 'orange' # Sanção de 2 minutos ativa
     if atleta['Estado'] == 'Desqualificado':
         return '🟥', 'red' # Desqualificado
@@ -101,22 +238,20 @@ def count_players_on_court():
         return 0
     return st.session_state.atletas_df['Em Campo'].sum()
 
-def has_goalkeeper_on_court():
-    """Verifica se existe um guarda-redes em campo."""
-    if not st.session_state.excel_loaded:
-        return False
-    return st.session_state.atletas_df[
-        (st.session_state.atletas_df['Posicao'] == 'GR') &
-        (st.session_state.atletas_df['Em Campo'])
-    ].shape[0] > 0
-
 def get_team_situation():
     """Determina a situação atual da equipa (Igualdade, Inferioridade, etc.)."""
-    n_jogadores_campo = count_players_on_court()
-    n_sancoes_ativas_proprias = len([t for t in st.session_state.sanction_timers.values() if time.time() < t])
+    n_jogadores_campo = 0
+    gr_em_campo = False
+    if st.session_state.excel_loaded:
+        # Uma só máscara "Em Campo" dá o número de jogadores e se há GR em campo
+        df = st.session_state.atletas_df
+        em_campo = df['Em Campo']
+        n_jogadores_campo = em_campo.sum()
+        gr_em_campo = (em_campo & (df['Posicao'] == 'GR')).any()
+    n_sancoes_ativas_proprias = len(st.session_state.sanction_timers) # Só tem sanções ativas (ver expire_sanctions)
 
     # Situação 7x6
-    if n_jogadores_campo == 7 and not has_goalkeeper_on_court():
+    if n_jogadores_campo == 7 and not gr_em_campo:
         return "7x6"
 
     # Superioridade
@@ -131,11 +266,267 @@ def get_team_situation():
     return "Igualdade"
 
 
+# --- Componentes da Interface ---
+
+# Cabeçalhos e larguras das colunas das listas de Guarda-Redes e Jogadores de Campo
+GR_HEADERS = ("Atleta", "Tempo", "Rem. Sofrido", "Falha Téc.", "Conquista", "Golo", "Negativo", "Sanção")
+GR_COL_WIDTHS = (2, 1, 1, 1, 1, 1, 1, 1)
+JC_HEADERS = ("Atleta", "Tempo", "Remate Exec.", "Falha Téc.", "Conquista", "Negativo", "Sanção")
+JC_COL_WIDTHS = (2, 1, 1, 1, 1, 1, 1)
+
+# Eventos do popover "Negativo": (texto do botão, prefixo da key). Todos contam como falha técnica.
+NEGATIVE_EVENTS = (("Passos", "passos"), ("Perda de Bola", "perda_bola"), ("7m", "7m"))
+
+def apply_two_minutes(index, numero_atleta):
+    """Regista uma sanção de 2 minutos ao atleta; à 3ª fica desqualificado."""
+    df = st.session_state.atletas_df
+    df.at[index, 'Contador 2min'] += 1
+    df.at[index, 'Sanções'] += '2\' '
+    start_sanction_timer(numero_atleta)
+    if df.at[index, 'Contador 2min'] >= 3:
+        df.at[index, 'Estado'] = 'Desqualificado'
+
+def add_counter(index, col):
+    """Callback dos botões de contadores e dos eventos negativos: soma 1 à coluna do atleta."""
+    st.session_state.atletas_df.at[index, col] += 1
+    # O clique só re-executa o fragmento das listas: pede a execução completa que atualiza o Resumo
+    st.session_state.full_rerun_pending = True
+
+def render_substitution_button(container, index, atleta, tipo, n_jogadores_em_campo, now):
+    """Botão com o nome do atleta que o faz entrar ou sair de campo (bloqueado durante sanções)."""
+    numero_atleta = atleta['Numero']
+
+    # Tempo de sanção em falta, calculado uma vez para o ícone, o timer e o bloqueio
+    end_time = st.session_state.sanction_timers.get(numero_atleta)
+    remaining_time = end_time - now if end_time is not None else 0
+    badge, color = get_player_status_color(atleta, remaining_time)
+
+    timer_display = f" ({format_time(remaining_time)})" if remaining_time > 0 else ""
+    is_disabled = atleta['Estado'] in ['Desqualificado', 'Sanção Oficial'] or remaining_time > 0
+
+    if container.button(f"{badge} {atleta['Nome']} | Nº{numero_atleta}{timer_display}", key=f"sub_{tipo}_{numero_atleta}", disabled=is_disabled, use_container_width=True):
+        df = st.session_state.atletas_df
+        if atleta['Em Campo']:
+            df.at[index, 'Em Campo'] = False
+        else:
+            # Regra: não pode entrar se a equipa já tiver 7 em campo (contagem feita uma vez por render)
+            if n_jogadores_em_campo < 7:
+                df.at[index, 'Em Campo'] = True
+            else:
+                st.toast("A equipa já tem 7 jogadores em campo!", icon="⚠️")
+        st.rerun()
+
+def render_negative_popover(container, index, numero_atleta, tipo):
+    """Desenha o popover de eventos negativos de um atleta (tipo 'gr' ou 'jc' nas keys)."""
+    with container.popover("➖", use_container_width=True):
+        for label, key_prefix in NEGATIVE_EVENTS:
+            # O callback corre antes do rerun provocado pelo clique, por isso não é preciso st.rerun()
+            st.button(label, key=f"{key_prefix}_{tipo}_{numero_atleta}", on_click=add_counter, args=(index, 'Falhas Técnicas'))
+
+def render_sanction_popover(container, index, numero_atleta, nome_atleta, tipo):
+    """Desenha o popover de sanções de um atleta (tipo 'gr' ou 'jc' nas keys)."""
+    with container.popover("징", use_container_width=True):
+        st.write(f"Sancionar {nome_atleta}")
+        if st.button("Amarelo", key=f"amarelo_{tipo}_{numero_atleta}"):
+            st.session_state.atletas_df.at[index, 'Sanções'] += 'A '
+            st.rerun()
+        if st.button("2 Minutos", key=f"2min_{tipo}_{numero_atleta}"):
+            apply_two_minutes(index, numero_atleta)
+            st.rerun()
+        if st.button("Vermelho", key=f"verm_{tipo}_{numero_atleta}"):
+            df = st.session_state.atletas_df
+            df.at[index, 'Estado'] = 'Desqualificado'
+            df.at[index, 'Sanções'] += 'V '
+            st.rerun()
+        if st.button("2m + 7m", key=f"2m7m_{tipo}_{numero_atleta}"):
+            st.session_state.atletas_df.at[index, 'Falhas Técnicas'] += 1
+            apply_two_minutes(index, numero_atleta)
+            st.rerun()
+
+
+# Segundos entre gravações automáticas durante o jogo (os ticks do cronómetro são de 1 s)
+AUTOSAVE_INTERVAL = 10
+
+# Segundos entre execuções do fragmento das listas de atletas durante o jogo: com sanções/superioridade
+# a contar (timers nos botões) ou só para a coluna "Min"
+COUNTDOWN_RERUN_INTERVAL = 2
+MINUTES_RERUN_INTERVAL = 15
+
+# Estilos do banner de estado (3/4) e do cronómetro (1/4). São emitidos uma vez por execução completa,
+# fora do fragmento, para que cada tick só envie o HTML curto de CRONO_HTML.
+CRONO_CSS = """
+<style>
+.crono-linha { display: flex; gap: 1rem; margin-bottom: 10px; }
+.crono-banner { flex: 3; background-color: #222; padding: 10px; border-radius: 5px; display: flex; align-items: center; justify-content: center; }
+.crono-relogio { flex: 1; background-color: #333; padding: 10px; border-radius: 5px; text-align: center; }
+.crono-estado { color: white; font-size: 1.75rem; font-weight: 600; }
+.crono-tempo { color: white; font-size: 2.5em; font-weight: 700; }
+</style>
+"""
+
+# Só os campos entre chavetas mudam a cada tick
+CRONO_HTML = """
+<div class="crono-linha">
+    <div class="crono-banner"><div class="crono-estado">{estado} | {situacao}</div></div>
+    <div class="crono-relogio"><div class="crono-tempo">{tempo}</div></div>
+</div>
+"""
+
+def render_cronometro():
+    """Desenha o banner de estado e o cronómetro e, com o jogo a correr, faz o tick do tempo."""
+    # Sanções que terminaram entretanto alteram as listas de atletas: redesenha a app inteira
+    if expire_sanctions():
+        st.rerun()
+
+    # Atualiza o tempo decorrido se o cronómetro estiver a correr
+    if st.session_state.running:
+        st.session_state.elapsed_time = time.time() - st.session_state.start_time
+        tick_play_time()
+
+    # Banner de estado e cronómetro num único elemento
+    st.markdown(
+        CRONO_HTML.format(
+            estado="EM JOGO" if st.session_state.running else "PAUSADO",
+            situacao=get_team_situation(),
+            tempo=format_time(st.session_state.elapsed_time),
+        ),
+        unsafe_allow_html=True
+    )
+
+    # Nos ticks só este fragmento corre, por isso grava aqui o tempo de jogo atualizado, mas só de
+    # AUTOSAVE_INTERVAL em AUTOSAVE_INTERVAL segundos. Não se perde tempo de jogo: o last_tick é gravado
+    # junto com o 'Tempo Jogo (s)' e, ao recarregar, o tick seguinte soma o intervalo em falta.
+    # Cliques e Pausa correm a app inteira, que grava sempre no fim.
+    if st.session_state.running:
+        now = time.time()
+        if now - st.session_state.get('last_autosave', 0) >= AUTOSAVE_INTERVAL:
+            save_state()
+            st.session_state.last_autosave = now
+
+
+def render_gestao_atletas():
+    """Desenha as listas de atletas, os oficiais e as ações do adversário."""
+    # Um callback de um clique neste fragmento alterou dados que o Resumo também mostra
+    if st.session_state.pop('full_rerun_pending', False):
+        st.rerun(scope="app")
+
+    n_jogadores_em_campo = count_players_on_court()
+    # Instante de referência para os timers de sanção desenhados neste render
+    now = time.time()
+
+    # Separação por Posição: uma única conversão para dicts (escalares Python, sem Series por linha)
+    # em vez de filtrar duas cópias do DataFrame
+    df_atletas = st.session_state.atletas_df
+    linhas_gr, linhas_jogadores = [], []
+    for index, atleta in zip(df_atletas.index, df_atletas.to_dict('records')):
+        (linhas_gr if atleta['Posicao'] == 'GR' else linhas_jogadores).append((index, atleta))
+
+    # --- Guarda-Redes ---
+    st.markdown("##### Guarda-Redes")
+    gr_cols = st.columns(GR_COL_WIDTHS)
+    for col, header in zip(gr_cols, GR_HEADERS):
+        col.markdown(f"**{header}**")
+
+    for index, atleta in linhas_gr:
+        nome_atleta = atleta['Nome']
+        numero_atleta = atleta['Numero']
+
+        # Coluna do nome com botão de substituição
+        render_substitution_button(gr_cols[0], index, atleta, 'gr', n_jogadores_em_campo, now)
+
+        # Outras colunas de eventos (o callback soma ao contador e pede a execução completa que atualiza o Resumo)
+        gr_cols[1].metric("Min", f"{atleta['Tempo Jogo (s)'] // 60}")
+        gr_cols[2].button("🥅", key=f"rem_sfr_gr_{numero_atleta}", on_click=add_counter, args=(index, 'Remates Sofridos'), use_container_width=True)
+        gr_cols[3].button("✋", key=f"falha_tec_gr_{numero_atleta}", on_click=add_counter, args=(index, 'Falhas Técnicas'), use_container_width=True)
+        gr_cols[4].button("🏆", key=f"conq_gr_{numero_atleta}", on_click=add_counter, args=(index, 'Conquistas'), use_container_width=True)
+        gr_cols[5].button("⚽", key=f"golo_gr_{numero_atleta}", on_click=add_counter, args=(index, 'Golos'), use_container_width=True)
+
+        # Pop-up para eventos negativos
+        render_negative_popover(gr_cols[6], index, numero_atleta, 'gr')
+
+        # Pop-up para sanções
+        render_sanction_popover(gr_cols[7], index, numero_atleta, nome_atleta, 'gr')
+
+
+    st.markdown("---")
+    # --- Jogadores de Campo ---
+    st.markdown("##### Jogadores de Campo")
+    jc_cols = st.columns(JC_COL_WIDTHS)
+    for col, header in zip(jc_cols, JC_HEADERS):
+        col.markdown(f"**{header}**")
+
+    for index, atleta in linhas_jogadores:
+        nome_atleta = atleta['Nome']
+        numero_atleta = atleta['Numero']
+
+        render_substitution_button(jc_cols[0], index, atleta, 'jc', n_jogadores_em_campo, now)
+
+        jc_cols[1].metric("Min", f"{atleta['Tempo Jogo (s)'] // 60}")
+        jc_cols[2].button("🎯", key=f"rem_exe_jc_{numero_atleta}", on_click=add_counter, args=(index, 'Golos'), use_container_width=True) # Assumindo que remate executado é golo para simplificar
+        jc_cols[3].button("✋", key=f"falha_tec_jc_{numero_atleta}", on_click=add_counter, args=(index, 'Falhas Técnicas'), use_container_width=True)
+        jc_cols[4].button("🏆", key=f"conq_jc_{numero_atleta}", on_click=add_counter, args=(index, 'Conquistas'), use_container_width=True)
+
+        render_negative_popover(jc_cols[5], index, numero_atleta, 'jc')
+
+        render_sanction_popover(jc_cols[6], index, numero_atleta, nome_atleta, 'jc')
+
+
+    st.markdown("---")
+    # --- Oficiais e Sanções Adversárias ---
+    col_oficiais, col_adv = st.columns(2)
+
+    with col_oficiais:
+        st.markdown("##### Oficiais")
+        df_oficiais = st.session_state.oficiais_df
+        for index, oficial in zip(df_oficiais.index, df_oficiais.to_dict('records')):
+            oficial_cols = st.columns([2, 1])
+            oficial_cols[0].markdown(f"**{oficial['Posicao']}**: {oficial['Nome']}")
+            # CORREÇÃO: Removido o argumento 'key' do popover
+            with oficial_cols[1].popover("징 Sanção", use_container_width=True):
+                if st.button("Amarelo", key=f"amarelo_oficial_{index}"):
+                    st.session_state.oficiais_df.at[index, 'Sanções'] += 'A '
+                    st.rerun()
+                if st.button("2 Minutos", key=f"2min_oficial_{index}"):
+                    st.session_state.oficiais_df.at[index, 'Sanções'] += '2\' '
+                    # Lógica para bloquear um jogador
+                    # Pega no primeiro jogador em campo que não seja GR e não tenha sanção
+                    jogadores_campo = st.session_state.atletas_df[
+                        (st.session_state.atletas_df['Em Campo']) &
+                        (st.session_state.atletas_df['Posicao'] != 'GR') &
+                        (st.session_state.atletas_df['Estado'] != 'Desqualificado')
+                    ]
+                    if not jogadores_campo.empty:
+                        idx_jogador_a_sancionar = jogadores_campo.index[0]
+                        num_jogador = int(st.session_state.atletas_df.at[idx_jogador_a_sancionar, 'Numero'])
+                        st.session_state.atletas_df.at[idx_jogador_a_sancionar, 'Estado'] = 'Sanção Oficial'
+                        start_sanction_timer(num_jogador)
+                        st.toast(f"Sanção de oficial. {st.session_state.atletas_df.at[idx_jogador_a_sancionar, 'Nome']} fica de fora por 2 min.", icon="🔵")
+                    st.rerun()
+                if st.button("Vermelho", key=f"verm_oficial_{index}"):
+                     st.session_state.oficiais_df.at[index, 'Sanções'] += 'V '
+                     st.rerun()
+
+    with col_adv:
+        st.markdown("##### Ações Adversário")
+        timer_adv_display = ""
+        rem_time = st.session_state.adversary_sanction_timer - now
+        if rem_time > 0:
+            timer_adv_display = f"Superioridade ({format_time(rem_time)})"
+
+        with st.popover(f"➕ Sanção Adversário {timer_adv_display}", use_container_width=True):
+            st.write("Registar sanção na equipa adversária:")
+            if st.button("2 Minutos Adversário", key="adv_2min"):
+                st.session_state.adversary_sanction_timer = time.time() + 120
+                st.rerun()
+            if st.button("Vermelho Adversário", key="adv_verm"):
+                st.session_state.adversary_sanction_timer = time.time() + 120 # Vermelho direto também implica 2 min de inferioridade
+                st.rerun()
+
+
 # --- Interface Principal ---
 
 def main_app():
     """Função que desenha a aplicação principal."""
-
     # --- Sidebar ---
     with st.sidebar:
         st.header("Configuração do Jogo")
@@ -147,19 +538,17 @@ def main_app():
 
         if uploaded_file is not None and not st.session_state.excel_loaded:
             try:
-                atletas = pd.read_excel(uploaded_file, sheet_name='Atletas')
-                oficiais = pd.read_excel(uploaded_file, sheet_name='Oficiais')
+                file_bytes = uploaded_file.getvalue()
+                file_key = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+                atletas, oficiais = parse_plantel_excel(file_key, file_bytes)
 
                 # Validação de colunas obrigatórias (ajustado para o seu ficheiro)
-                required_atleta_cols = ['Numero', 'Nome', 'Posicao']
-                required_oficial_cols = ['Posicao', 'Nome']
-
-                missing_atleta_cols = [col for col in required_atleta_cols if col not in atletas.columns]
+                missing_atleta_cols = [col for col in REQUIRED_ATLETA_COLS if col not in atletas.columns]
                 if missing_atleta_cols:
                     st.error(f"Erro na folha 'Atletas': Faltam as colunas obrigatórias: {', '.join(missing_atleta_cols)}. Verifique o seu ficheiro Excel.")
                     st.stop()
 
-                missing_oficial_cols = [col for col in required_oficial_cols if col not in oficiais.columns]
+                missing_oficial_cols = [col for col in REQUIRED_OFICIAL_COLS if col not in oficiais.columns]
                 if missing_oficial_cols:
                     st.error(f"Erro na folha 'Oficiais': Faltam as colunas obrigatórias: {', '.join(missing_oficial_cols)}. Verifique o seu ficheiro Excel.")
                     st.stop()
@@ -183,8 +572,8 @@ def main_app():
 
                     oficiais['Sanções'] = ''
 
-                    st.session_state.atletas_df = atletas
-                    st.session_state.oficiais_df = oficiais
+                    st.session_state.atletas_df = set_category_dtypes(atletas)
+                    st.session_state.oficiais_df = set_category_dtypes(oficiais)
                     st.session_state.excel_loaded = True
                     st.success("Plantel carregado com sucesso!")
                     # Força o rerender para desbloquear a app
@@ -209,38 +598,9 @@ def main_app():
 
     with tab_principal:
         # --- Cronómetro e Banner de Estado ---
-        crono_col1, crono_col2 = st.columns([3, 1])
-
-        with crono_col1:
-            # Atualiza o tempo decorrido se o cronómetro estiver a correr
-            if st.session_state.running:
-                st.session_state.elapsed_time = time.time() - st.session_state.start_time
-
-            # Banner de estado
-            game_status_text = "EM JOGO" if st.session_state.running else "PAUSADO"
-            team_situation_text = get_team_situation()
-            st.markdown(
-                f"""
-                <div style="background-color: #222; padding: 10px; border-radius: 5px; text-align: center; margin-bottom: 10px;">
-                    <h3 style="color: white; margin: 0;">
-                        {game_status_text} | {team_situation_text}
-                    </h3>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-        with crono_col2:
-            st.markdown(
-                f"""
-                <div style="background-color: #333; padding: 10px; border-radius: 5px; text-align: center;">
-                    <h1 style="color: white; margin: 0; font-size: 2.5em;">
-                        {format_time(st.session_state.elapsed_time)}
-                    </h1>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        st.markdown(CRONO_CSS, unsafe_allow_html=True)
+        # Com o jogo a correr, só este fragmento é re-executado a cada segundo (não a página inteira)
+        st.fragment(render_cronometro, run_every=1 if st.session_state.running else None)()
 
         # Botões do Cronómetro
         crono_botoes = st.columns(4)
@@ -253,6 +613,7 @@ def main_app():
         if crono_botoes[0].button("▶️ Play", disabled=play_disabled, help=play_help_text, use_container_width=True):
             if not st.session_state.running:
                 st.session_state.start_time = time.time() - st.session_state.elapsed_time
+                st.session_state.last_tick = time.time()
                 st.session_state.running = True
                 if not st.session_state.game_started:
                     st.session_state.game_started = True
@@ -271,6 +632,7 @@ def main_app():
             st.session_state.running = False
             st.session_state.game_started = False
             st.session_state.sanction_timers = {}
+            st.session_state.sanction_heap = []
             st.session_state.adversary_sanction_timer = 0
             # Recarrega o estado inicial dos jogadores a partir do dataframe original
             initialize_state()
@@ -294,231 +656,15 @@ def main_app():
         # --- Gestão de Atletas ---
         st.subheader("Gestão de Atletas em Jogo")
 
-        # Separação por Posição
-        df_gr = st.session_state.atletas_df[st.session_state.atletas_df['Posicao'] == 'GR']
-        df_jogadores = st.session_state.atletas_df[st.session_state.atletas_df['Posicao'] != 'GR']
-
-        # --- Guarda-Redes ---
-        st.markdown("##### Guarda-Redes")
-        gr_cols = st.columns([2, 1, 1, 1, 1, 1, 1, 1])
-        headers = ["Atleta", "Tempo", "Rem. Sofrido", "Falha Téc.", "Conquista", "Golo", "Negativo", "Sanção"]
-        for col, header in zip(gr_cols, headers):
-            col.markdown(f"**{header}**")
-
-        for index, atleta in df_gr.iterrows():
-            badge, color = get_player_status_color(atleta)
-            nome_atleta = atleta['Nome']
-            numero_atleta = atleta['Numero']
-
-            # Coluna do nome com botão de substituição
-            with gr_cols[0]:
-                # Timer de sanção
-                timer_display = ""
-                if numero_atleta in st.session_state.sanction_timers:
-                    remaining_time = st.session_state.sanction_timers[numero_atleta] - time.time()
-                    if remaining_time > 0:
-                        timer_display = f" ({format_time(remaining_time)})"
-
-                # Botão de substituição
-                is_disabled = (atleta['Estado'] in ['Desqualificado', 'Sanção Oficial'] or
-                               (numero_atleta in st.session_state.sanction_timers and time.time() < st.session_state.sanction_timers[numero_atleta]))
-
-                if st.button(f"{badge} {nome_atleta} | Nº{numero_atleta}{timer_display}", key=f"sub_gr_{numero_atleta}", disabled=is_disabled, use_container_width=True):
-                    if atleta['Em Campo']:
-                        st.session_state.atletas_df.loc[index, 'Em Campo'] = False
-                    else:
-                        # Regra: não pode entrar se a equipa já tiver 7 em campo
-                        if count_players_on_court() < 7:
-                            st.session_state.atletas_df.loc[index, 'Em Campo'] = True
-                        else:
-                            st.toast("A equipa já tem 7 jogadores em campo!", icon="⚠️")
-                    st.rerun()
-
-            # Outras colunas de eventos
-            gr_cols[1].metric("Min", f"{atleta['Tempo Jogo (s)'] // 60}")
-            if gr_cols[2].button("🥅", key=f"rem_sfr_gr_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Remates Sofridos'] += 1
-                st.rerun()
-            if gr_cols[3].button("✋", key=f"falha_tec_gr_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                st.rerun()
-            if gr_cols[4].button("🏆", key=f"conq_gr_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Conquistas'] += 1
-                st.rerun()
-            if gr_cols[5].button("⚽", key=f"golo_gr_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Golos'] += 1
-                st.rerun()
-
-            # Pop-up para eventos negativos
-            with gr_cols[6].popover("➖", use_container_width=True):
-                 if st.button("Passos", key=f"passos_gr_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-                 if st.button("Perda de Bola", key=f"perda_bola_gr_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-                 if st.button("7m", key=f"7m_gr_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-
-            # Pop-up para sanções
-            with gr_cols[7].popover("징", use_container_width=True):
-                st.write(f"Sancionar {nome_atleta}")
-                if st.button("Amarelo", key=f"amarelo_gr_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += 'A '
-                    st.rerun()
-                if st.button("2 Minutos", key=f"2min_gr_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Contador 2min'] += 1
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += '2\' '
-                    st.session_state.sanction_timers[numero_atleta] = time.time() + 120
-                    # Se for a 3ª sanção de 2min, desqualifica
-                    if st.session_state.atletas_df.loc[index, 'Contador 2min'] >= 3:
-                        st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.rerun()
-                if st.button("Vermelho", key=f"verm_gr_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += 'V '
-                    st.rerun()
-                if st.button("2m + 7m", key=f"2m7m_gr_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                    st.session_state.atletas_df.loc[index, 'Contador 2min'] += 1
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += '2\' '
-                    st.session_state.sanction_timers[numero_atleta] = time.time() + 120
-                    if st.session_state.atletas_df.loc[index, 'Contador 2min'] >= 3:
-                        st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.rerun()
-
-
-        st.markdown("---")
-        # --- Jogadores de Campo ---
-        st.markdown("##### Jogadores de Campo")
-        jc_cols = st.columns([2, 1, 1, 1, 1, 1, 1])
-        headers_jc = ["Atleta", "Tempo", "Remate Exec.", "Falha Téc.", "Conquista", "Negativo", "Sanção"]
-        for col, header in zip(jc_cols, headers_jc):
-            col.markdown(f"**{header}**")
-
-        for index, atleta in df_jogadores.iterrows():
-            badge, color = get_player_status_color(atleta)
-            nome_atleta = atleta['Nome']
-            numero_atleta = atleta['Numero']
-
-            with jc_cols[0]:
-                timer_display = ""
-                if numero_atleta in st.session_state.sanction_timers:
-                    remaining_time = st.session_state.sanction_timers[numero_atleta] - time.time()
-                    if remaining_time > 0:
-                        timer_display = f" ({format_time(remaining_time)})"
-
-                is_disabled = (atleta['Estado'] in ['Desqualificado', 'Sanção Oficial'] or
-                               (numero_atleta in st.session_state.sanction_timers and time.time() < st.session_state.sanction_timers[numero_atleta]))
-
-                if st.button(f"{badge} {nome_atleta} | Nº{numero_atleta}{timer_display}", key=f"sub_jc_{numero_atleta}", disabled=is_disabled, use_container_width=True):
-                    if atleta['Em Campo']:
-                        st.session_state.atletas_df.loc[index, 'Em Campo'] = False
-                    else:
-                        if count_players_on_court() < 7:
-                            st.session_state.atletas_df.loc[index, 'Em Campo'] = True
-                        else:
-                            st.toast("A equipa já tem 7 jogadores em campo!", icon="⚠️")
-                    st.rerun()
-
-            jc_cols[1].metric("Min", f"{atleta['Tempo Jogo (s)'] // 60}")
-            if jc_cols[2].button("🎯", key=f"rem_exe_jc_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Golos'] += 1 # Assumindo que remate executado é golo para simplificar
-                st.rerun()
-            if jc_cols[3].button("✋", key=f"falha_tec_jc_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                st.rerun()
-            if jc_cols[4].button("🏆", key=f"conq_jc_{numero_atleta}", use_container_width=True):
-                st.session_state.atletas_df.loc[index, 'Conquistas'] += 1
-                st.rerun()
-
-            with jc_cols[5].popover("➖", use_container_width=True):
-                 if st.button("Passos", key=f"passos_jc_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-                 if st.button("Perda de Bola", key=f"perda_bola_jc_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-                 if st.button("7m", key=f"7m_jc_{numero_atleta}"):
-                     st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                     st.rerun()
-
-            with jc_cols[6].popover("징", use_container_width=True):
-                st.write(f"Sancionar {nome_atleta}")
-                if st.button("Amarelo", key=f"amarelo_jc_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += 'A '
-                    st.rerun()
-                if st.button("2 Minutos", key=f"2min_jc_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Contador 2min'] += 1
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += '2\' '
-                    st.session_state.sanction_timers[numero_atleta] = time.time() + 120
-                    if st.session_state.atletas_df.loc[index, 'Contador 2min'] >= 3:
-                        st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.rerun()
-                if st.button("Vermelho", key=f"verm_jc_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += 'V '
-                    st.rerun()
-                if st.button("2m + 7m", key=f"2m7m_jc_{numero_atleta}"):
-                    st.session_state.atletas_df.loc[index, 'Falhas Técnicas'] += 1
-                    st.session_state.atletas_df.loc[index, 'Contador 2min'] += 1
-                    st.session_state.atletas_df.loc[index, 'Sanções'] += '2\' '
-                    st.session_state.sanction_timers[numero_atleta] = time.time() + 120
-                    if st.session_state.atletas_df.loc[index, 'Contador 2min'] >= 3:
-                        st.session_state.atletas_df.loc[index, 'Estado'] = 'Desqualificado'
-                    st.rerun()
-
-
-        st.markdown("---")
-        # --- Oficiais e Sanções Adversárias ---
-        col_oficiais, col_adv = st.columns(2)
-
-        with col_oficiais:
-            st.markdown("##### Oficiais")
-            for index, oficial in st.session_state.oficiais_df.iterrows():
-                oficial_cols = st.columns([2, 1])
-                oficial_cols[0].markdown(f"**{oficial['Posicao']}**: {oficial['Nome']}")
-                # CORREÇÃO: Removido o argumento 'key' do popover
-                with oficial_cols[1].popover("징 Sanção", use_container_width=True):
-                    if st.button("Amarelo", key=f"amarelo_oficial_{index}"):
-                        st.session_state.oficiais_df.loc[index, 'Sanções'] += 'A '
-                        st.rerun()
-                    if st.button("2 Minutos", key=f"2min_oficial_{index}"):
-                        st.session_state.oficiais_df.loc[index, 'Sanções'] += '2\' '
-                        # Lógica para bloquear um jogador
-                        # Pega no primeiro jogador em campo que não seja GR e não tenha sanção
-                        jogadores_campo = st.session_state.atletas_df[
-                            (st.session_state.atletas_df['Em Campo']) &
-                            (st.session_state.atletas_df['Posicao'] != 'GR') &
-                            (st.session_state.atletas_df['Estado'] != 'Desqualificado')
-                        ]
-                        if not jogadores_campo.empty:
-                            idx_jogador_a_sancionar = jogadores_campo.index[0]
-                            num_jogador = st.session_state.atletas_df.loc[idx_jogador_a_sancionar, 'Numero']
-                            st.session_state.atletas_df.loc[idx_jogador_a_sancionar, 'Estado'] = 'Sanção Oficial'
-                            st.session_state.sanction_timers[num_jogador] = time.time() + 120
-                            st.toast(f"Sanção de oficial. {st.session_state.atletas_df.loc[idx_jogador_a_sancionar, 'Nome']} fica de fora por 2 min.", icon="🔵")
-                        st.rerun()
-                    if st.button("Vermelho", key=f"verm_oficial_{index}"):
-                         st.session_state.oficiais_df.loc[index, 'Sanções'] += 'V '
-                         st.rerun()
-
-        with col_adv:
-            st.markdown("##### Ações Adversário")
-            timer_adv_display = ""
-            if time.time() < st.session_state.adversary_sanction_timer:
-                rem_time = st.session_state.adversary_sanction_timer - time.time()
-                timer_adv_display = f"Superioridade ({format_time(rem_time)})"
-
-            with st.popover(f"➕ Sanção Adversário {timer_adv_display}", use_container_width=True):
-                st.write("Registar sanção na equipa adversária:")
-                if st.button("2 Minutos Adversário", key="adv_2min"):
-                    st.session_state.adversary_sanction_timer = time.time() + 120
-                    st.rerun()
-                if st.button("Vermelho Adversário", key="adv_verm"):
-                    st.session_state.adversary_sanction_timer = time.time() + 120 # Vermelho direto também implica 2 min de inferioridade
-                    st.rerun()
+        # Listas de atletas, oficiais e superioridade num fragmento próprio: com o jogo a correr é re-executado
+        # de tempos a tempos para os timers de sanção, a superioridade e a coluna "Min" não ficarem parados,
+        # sem correr a app inteira. Mais curto enquanto houver contagens decrescentes a mostrar.
+        if st.session_state.running:
+            countdowns = st.session_state.sanction_timers or time.time() < st.session_state.adversary_sanction_timer
+            intervalo_listas = COUNTDOWN_RERUN_INTERVAL if countdowns else MINUTES_RERUN_INTERVAL
+        else:
+            intervalo_listas = None
+        st.fragment(render_gestao_atletas, run_every=intervalo_listas)()
 
     with tab_resumo:
         st.header("Resumo e Estatísticas do Jogo")
@@ -536,29 +682,8 @@ def main_app():
 # --- Loop Principal e Atualização de Estado ---
 if __name__ == "__main__":
     initialize_state()
+    expire_sanctions()
     main_app()
 
-    # Lógica para manter a app a atualizar a cada segundo quando o cronómetro está a correr
-    if st.session_state.get('running', False):
-        # Atualiza o tempo de jogo dos atletas em campo
-        for index, atleta in st.session_state.atletas_df.iterrows():
-            if atleta['Em Campo']:
-                st.session_state.atletas_df.loc[index, 'Tempo Jogo (s)'] += 1
-
-        # Limpa sanções expiradas
-        now = time.time()
-        for numero, end_time in list(st.session_state.sanction_timers.items()):
-            if now >= end_time:
-                del st.session_state.sanction_timers[numero]
-                # Reverte o estado de 'Sanção Oficial' se aplicável
-                idx = st.session_state.atletas_df[st.session_state.atletas_df['Numero'] == numero].index
-                if not idx.empty and st.session_state.atletas_df.loc[idx[0], 'Estado'] == 'Sanção Oficial':
-                     st.session_state.atletas_df.loc[idx[0], 'Estado'] = 'Banco'
-
-        # Guarda o estado atual
-        save_state()
-        time.sleep(1)
-        st.rerun()
-    else:
-        # Guarda o estado mesmo quando pausado para persistir outras alterações
-        save_state()
+    # Guarda o estado para persistir as alterações (o cronómetro faz o seu próprio tick e gravação)
+    save_state()
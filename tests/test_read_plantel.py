@@ -0,0 +1,72 @@
+import sys
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from teste import read_plantel_excel
+
+
+def make_plantel(atletas_rows, oficiais_rows):
+    """Cria um Plantel.xlsx em memória com as folhas 'Atletas' e 'Oficiais'."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Atletas'
+    for row in atletas_rows:
+        ws.append(row)
+    ws_oficiais = wb.create_sheet('Oficiais')
+    for row in oficiais_rows:
+        ws_oficiais.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ReadPlantelExcelTest(unittest.TestCase):
+
+    def test_reads_both_sheets(self):
+        plantel = make_plantel(
+            [['Numero', 'Nome', 'Posicao'], [1, 'Ana', 'GR'], [7, 'Rita', 'PV']],
+            [['Posicao', 'Nome'], ['Treinador', 'Joana']],
+        )
+        atletas, oficiais = read_plantel_excel(plantel)
+        self.assertEqual(list(atletas.columns), ['Numero', 'Nome', 'Posicao'])
+        self.assertEqual(atletas['Numero'].tolist(), [1, 7])
+        self.assertEqual(oficiais['Nome'].tolist(), ['Joana'])
+
+    def test_cells_right_of_header_become_unnamed_columns(self):
+        plantel = make_plantel(
+            [['Numero', 'Nome', 'Posicao'], [1, 'Ana', 'GR', 'capitã'], [7, 'Rita', 'PV']],
+            [['Posicao', 'Nome'], ['Treinador', 'Joana']],
+        )
+        atletas, _ = read_plantel_excel(plantel)
+        self.assertEqual(list(atletas.columns), ['Numero', 'Nome', 'Posicao', 'Unnamed: 3'])
+        self.assertEqual(atletas.loc[0, 'Unnamed: 3'], 'capitã')
+        self.assertTrue(atletas['Unnamed: 3'].isna()[1])
+
+    def test_duplicate_headers_get_numeric_suffix(self):
+        plantel = make_plantel(
+            [['Numero', 'Nome', 'Posicao', 'Nome', 'Nome'], [1, 'Ana', 'GR', 'Ana Silva', 'Silva']],
+            [['Posicao', 'Nome']],
+        )
+        atletas, _ = read_plantel_excel(plantel)
+        self.assertEqual(list(atletas.columns), ['Numero', 'Nome', 'Posicao', 'Nome.1', 'Nome.2'])
+        self.assertEqual(atletas.loc[0, 'Nome'], 'Ana')
+        self.assertEqual(atletas.loc[0, 'Nome.1'], 'Ana Silva')
+
+    def test_skips_empty_rows(self):
+        plantel = make_plantel(
+            [['Numero', 'Nome', 'Posicao'], [1, 'Ana', 'GR'], [None, None, None], [7, 'Rita', 'PV']],
+            [['Posicao', 'Nome']],
+        )
+        atletas, oficiais = read_plantel_excel(plantel)
+        self.assertEqual(atletas['Nome'].tolist(), ['Ana', 'Rita'])
+        self.assertTrue(oficiais.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()